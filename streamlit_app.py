@@ -2,7 +2,7 @@ import streamlit as st
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from selenium.webdriver.chrome.options import Options
 
 from selenium.webdriver.chrome.service import Service
@@ -10,11 +10,33 @@ from webdriver_manager.chrome import ChromeDriverManager
 
 from playwright.sync_api import sync_playwright
 
-from bs4 import BeautifulSoup
+import lxml.etree
+import lxml.html
 import pandas as pd
+import requests
+import atexit
+import threading
 import time
+from io import BytesIO
 
+REQUEST_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36'
+}
 
+# Compiled once instead of on every parse
+RACE_TABLES = lxml.etree.XPath(
+    "//table[contains(concat(' ', normalize-space(@class), ' '), ' compact-styled-table ')]"
+)
+
+UTF8_HTML_PARSER = lxml.html.HTMLParser(encoding='utf-8')
+
+# Known result columns (lowercased header) -> dtype, anything else is inferred
+COLUMN_DTYPES = {
+    'rank': 'Int64',
+    'bib': 'Int64',
+    'name': 'string',
+    'time': 'string',
+}
 
 
 
@@ -52,6 +74,11 @@ def setup_page():
     
     return st.empty()
     
+# Only resolve and download chromedriver once per process
+@st.cache_resource(show_spinner=False)
+def chrome_driver_path():
+    return ChromeDriverManager().install()
+
 def setup_selenium():
     chrome_options = Options()
     chrome_options.add_argument("--headless")
@@ -60,7 +87,7 @@ def setup_selenium():
     chrome_options.binary_location = "/usr/bin/chromium-browser"
     
     try:
-        service = Service(ChromeDriverManager().install())
+        service = Service(chrome_driver_path())
         driver = webdriver.Chrome(service=service, options=chrome_options)
         return driver
     except Exception as e:
@@ -77,86 +104,359 @@ def setup_browser():
         st.error(f"Error setting up browser: {str(e)}")
         return None, None, None
 
-def fetch_data(page, url):
+# Validators and parsed table from the last static response, kept per URL for
+# conditional GETs on the next poll. Only a few recent pages are kept
+@st.cache_resource(max_entries=8, show_spinner=False)
+def static_page(url):
+    return {}
+
+def fetch_static(url, validators=None, debug=False):
+    # Returns (html_content, validators, not_modified)
+    headers = REQUEST_HEADERS
+    if validators:
+        headers = {**REQUEST_HEADERS, **validators}
+    
     try:
-        page.goto(url)
-        page.wait_for_selector('.compact-styled-table', timeout=10000)
-        return page.content()
-    except Exception as e:
-        st.error(f"Error fetching data: {str(e)}")
+        response = requests.get(url, headers=headers, timeout=10)
+        if response.status_code == 304 and validators:
+            return None, validators, True
+        response.raise_for_status()
+    except requests.RequestException as e:
+        if debug:
+            st.text(f"Static fetch failed: {str(e)}")
+        return None, {}, False
+    
+    # Without a charset header requests assumes ISO-8859-1 and garbles accented names
+    if 'charset' not in response.headers.get('Content-Type', '').lower():
+        response.encoding = response.apparent_encoding
+    
+    validators = {}
+    if 'ETag' in response.headers:
+        validators['If-None-Match'] = response.headers['ETag']
+    if 'Last-Modified' in response.headers:
+        validators['If-Modified-Since'] = response.headers['Last-Modified']
+    return response.text, validators, False
+
+def fetch_data(driver, url):
+    driver.get(url)
+    try:
+        # Ready once result rows have rendered, not just the empty table
+        WebDriverWait(driver, 10).until(
+            lambda d: len(d.find_elements(By.CSS_SELECTOR, '.compact-styled-table tr')) > 1
+        )
+    except TimeoutException:
+        # No results posted yet, let the parser report that there's no race data
+        pass
+    return driver.page_source
+
+# One Chrome instance is kept alive and shared, launching it dominates scrape time
+@st.cache_resource(show_spinner=False)
+def get_driver():
+    driver = setup_selenium()
+    if driver:
+        atexit.register(driver.quit)
+    return driver
+
+# Streamlit reruns the script in a fresh module, so the lock has to be cached too
+@st.cache_resource(show_spinner=False)
+def driver_lock():
+    return threading.Lock()
+
+def fetch_with_browser(url):
+    # The shared driver can only load one page at a time
+    with driver_lock():
+        driver = get_driver()
+        if not driver:
+            get_driver.clear()
+            st.error("Failed to initialize Chrome driver")
+            return None
+        
+        try:
+            return fetch_data(driver, url)
+        except WebDriverException as e:
+            st.error(f"Error fetching data: {str(e)}")
+            # Don't keep reusing a driver that may have crashed
+            get_driver.clear()
+            atexit.unregister(driver.quit)
+            try:
+                driver.quit()
+            except Exception:
+                pass
+            return None
+        except Exception as e:
+            st.error(f"Error fetching data: {str(e)}")
+            return None
+
+
+
+def parse_html(html_content):
+    try:
+        return lxml.html.fromstring(html_content)
+    except ValueError:
+        # lxml rejects a str carrying an <?xml encoding=...?> declaration,
+        # the text is already decoded so hand it over as UTF-8 bytes
+        try:
+            return lxml.html.fromstring(html_content.encode('utf-8'), parser=UTF8_HTML_PARSER)
+        except lxml.etree.ParserError:
+            return None
+    except lxml.etree.ParserError:
         return None
 
+def row_text(row):
+    # text_content() gathers each cell's text in a single lxml call
+    return [cell.text_content().strip() for cell in row.iterchildren('td', 'th')]
+
+def apply_column_dtypes(df):
+    # Cast columns like rank and bib once so later operations run on typed data.
+    # Headers outside COLUMN_DTYPES become numeric only when that is lossless
+    for i, name in enumerate(df.columns):
+        kind = COLUMN_DTYPES.get(str(name).strip().lower(), 'numeric')
+        values = df.iloc[:, i]
+        values = values.mask(values == '')
+        try:
+            if kind == 'string':
+                values = values.astype(kind)
+            else:
+                converted = pd.to_numeric(values, dtype_backend='numpy_nullable')
+                if kind != 'numeric':
+                    converted = converted.astype(kind)
+                # Keep the page's text when a number wouldn't print the same,
+                # e.g. +0.51, 46.00 or a 007 bib
+                present = values.notna()
+                if not (converted[present].astype('string') == values[present]).all():
+                    raise ValueError(f"column {name!r} doesn't round-trip as a number")
+                values = converted
+            df.isetitem(i, values)
+        except (ValueError, TypeError):
+            pass
+    return df
 
+def fastest_time(col):
+    # Race times are usually m:ss.ff, pad them out to h:mm:ss.ff for to_timedelta
+    text = col.astype('string').str.strip().fillna('')
+    text = text.where(text.str.count(':') >= 1, '0:' + text)
+    text = text.where(text.str.count(':') >= 2, '0:' + text)
+    durations = pd.to_timedelta(text, errors='coerce')
+    if durations.isna().all():
+        return col.min()
+    # Show the fastest time as it was written on the results page
+    return col[durations.idxmin()]
 
-def parse_race_data(html_content):
-    soup = BeautifulSoup(html_content, 'html.parser')
+def parse_race_data(html_content, debug=False):
+    tree = parse_html(html_content)
     
-    if st.session_state.debug_mode:
+    if debug:
         st.text("Parsing HTML content...")
     
-    # Find all tables with the race data
-    tables = soup.find_all('table', {'class': 'compact-styled-table'})
-    
-    if st.session_state.debug_mode:
-        st.text(f"Found {len(tables)} race data tables")
-    
-    if not tables:
+    if tree is None:
         st.error("No race data tables found")
         return None
     
-    # Process each table to find the one with race results
+    # Match the class token inside libxml2, rows are still only read table by table
+    # so parsing stops at the first one with race results
+    tables = RACE_TABLES(tree)
+    
+    found_table = False
     for table in tables:
-        rows = table.find_all('tr')
+        found_table = True
+        rows = table.xpath('.//tr')
         if not rows:
             continue
-            
+        
         # Get headers from the first row
-        header_row = rows[0]
-        headers = [th.get_text(strip=True) for th in header_row.find_all(['th', 'td'])]
+        headers = row_text(rows[0])
         
         # Skip tables with no proper headers
         if not headers or len(headers) < 2:
             continue
             
-        if st.session_state.debug_mode:
+        if debug:
             st.text(f"Processing table with headers: {headers}")
         
-        # Extract data rows
-        data_rows = []
-        for row in rows[1:]:  # Skip header row
-            cols = row.find_all(['td', 'th'])
-            if cols:
-                row_data = [col.get_text(strip=True) for col in cols]
-                if any(row_data):  # Only add non-empty rows
-                    data_rows.append(row_data)
+        # Only keep non-empty data rows
+        data_rows = [cells for cells in map(row_text, rows[1:]) if any(cells)]
         
         if data_rows:
             try:
                 df = pd.DataFrame(data_rows, columns=headers)
                 # Remove any empty rows or columns
                 df = df.dropna(how='all').dropna(axis=1, how='all')
-                return df
+                return apply_column_dtypes(df)
             except Exception as e:
-                if st.session_state.debug_mode:
+                if debug:
                     st.text(f"Error processing table: {str(e)}")
                 continue
     
+    if not found_table:
+        st.error("No race data tables found")
+        return None
+    
     st.error("No valid race data found in any table")
     return None
 
-def main():
-    container = setup_page()
+# Reruns with the same table reuse the encoded bytes
+@st.cache_data(show_spinner=False)
+def df_to_csv_bytes(df):
+    # Encode straight into a byte buffer instead of building the whole CSV as a str first
+    buf = BytesIO()
+    df.to_csv(buf, index=False, encoding='utf-8', lineterminator='\n')
+    return buf.getvalue()
+
+def columnar_frame(df):
+    # Arrow needs a default index, unique column names and no mixed-type object columns
+    df = df.reset_index(drop=True)
+    names = [str(name) for name in df.columns]
+    duplicated = pd.Index(names).duplicated(keep=False)
+    df.columns = [
+        f"{name}_{i}" if is_duplicate else name
+        for i, (name, is_duplicate) in enumerate(zip(names, duplicated))
+    ]
+    object_columns = df.select_dtypes(include='object').columns
+    return df.astype({col: 'string' for col in object_columns})
+
+@st.cache_data(show_spinner=False)
+def df_to_parquet_bytes(df):
+    buf = BytesIO()
+    columnar_frame(df).to_parquet(buf, compression='snappy', index=False)
+    return buf.getvalue()
+
+@st.cache_data(show_spinner=False)
+def df_to_feather_bytes(df):
+    buf = BytesIO()
+    columnar_frame(df).to_feather(buf)
+    return buf.getvalue()
+
+# Export format -> (encoder, file extension, mime type)
+EXPORT_FORMATS = {
+    "CSV": (df_to_csv_bytes, "csv", "text/csv"),
+    "Parquet": (df_to_parquet_bytes, "parquet", "application/octet-stream"),
+    "Feather": (df_to_feather_bytes, "feather", "application/octet-stream"),
+}
+
+# Repeat scrapes of the same page within one poll interval skip the fetch and parse.
+# debug and poll are part of the cache key, the TTL only evicts old poll buckets
+@st.cache_data(ttl=60, show_spinner=False)
+def scrape(url, use_browser=False, debug=False, poll=0):
+    html_content = None
+    validators = {}
+    if not use_browser:
+        page = static_page(url)
+        html_content, validators, not_modified = fetch_static(url, page.get('validators'), debug)
+        if not_modified and 'df' in page:
+            # 304 Not Modified, the last parse is still current
+            if debug:
+                st.text("Page not modified since the last scrape")
+            return None, page['df']
+        
+        if html_content and 'compact-styled-table' not in html_content:
+            if debug:
+                st.text("Race table not in static HTML, falling back to browser")
+            html_content = None
+            validators = {}
     
-    # Initialize session state for debug mode
-    if 'debug_mode' not in st.session_state:
-        st.session_state.debug_mode = False
+    if html_content is None:
+        html_content = fetch_with_browser(url)
     
+    if not html_content:
+        return None, None
+    
+    if debug:
+        st.text(f"Retrieved {len(html_content)} characters of HTML")
+    
+    df = parse_race_data(html_content, debug)
+    if validators and df is not None:
+        page.update(validators=validators, df=df)
+    return html_content, df
+
+def scrape_section(use_browser, update_frequency):
     # URL input
     url = st.text_input(
         "Enter Race Timing URL",
         value="https://www.live-timing.com/race2.php?r=288556"
     )
     
+    # CSV stays the default, Parquet and Feather are smaller and faster to write
+    export_format = st.radio("Export format", list(EXPORT_FORMATS), horizontal=True)
+    
+    start = st.button("Start Scraping")
+    if st.button("Force refresh"):
+        scrape.clear()
+        static_page(url).clear()
+        start = True
+    
+    if start and not st.session_state.scraping:
+        # Polling only starts once run_every is picked up by a full rerun
+        st.session_state.scraping = True
+        st.rerun()
+    
+    if st.session_state.scraping and st.button("Stop Scraping"):
+        st.session_state.scraping = False
+        st.rerun()
+    
+    if not st.session_state.scraping:
+        return
+    
+    if st.session_state.debug_mode:
+        st.text(f"Attempting to scrape: {url}")
+    
+    poll = int(time.time() // update_frequency)
+    html_content, df = scrape(url, use_browser, st.session_state.debug_mode, poll)
+    
+    if df is not None:
+        st.success("Data successfully scraped!")
+            
+        # Add export button and data display in columns
+        col1, col2 = st.columns([1, 3])
+            
+        with col1:
+            # Create export button in the chosen format
+            encode, extension, mime = EXPORT_FORMATS[export_format]
+            export_data = encode(df)
+            timestamp = time.strftime("%Y%m%d_%H%M%S")
+            filename = f"race_data_{timestamp}.{extension}"
+                
+            st.download_button(
+                label=f"📥 Export to {export_format}",
+                data=export_data,
+                file_name=filename,
+                mime=mime
+            )
+            
+        with col2:
+            # Display data
+            st.dataframe(df)
+            
+        # Basic statistics
+        st.subheader("Race Statistics")
+        col1, col2 = st.columns(2)
+            
+        with col1:
+            st.metric("Total Entries", len(df))
+            
+        with col2:
+            time_columns = [col for col in df.columns if 'time' in col.lower()]
+            if time_columns:
+                try:
+                    best_time = fastest_time(df[time_columns[0]])
+                    st.metric("Best Time", best_time)
+                except:
+                    pass
+        
+    elif html_content:
+        st.error("Failed to parse data from the page")
+        if st.session_state.debug_mode:
+            st.text("HTML Preview (first 1000 characters):")
+            st.code(html_content[:1000], language='html')
+
+def main():
+    container = setup_page()
+    
+    # Initialize session state for debug mode and polling
+    if 'debug_mode' not in st.session_state:
+        st.session_state.debug_mode = False
+    if 'scraping' not in st.session_state:
+        st.session_state.scraping = False
+    
     # Debug mode toggle
     st.session_state.debug_mode = st.checkbox("Enable Debug Mode", value=True)
     
@@ -168,74 +468,13 @@ def main():
         value=10
     )
     
-    if st.button("Start Scraping"):
-        if st.session_state.debug_mode:
-            st.text(f"Attempting to scrape: {url}")
-        
-        # Setup Selenium
-        driver = setup_selenium()
-        if not driver:
-            st.error("Failed to initialize Chrome driver")
-            return
-        
-        try:
-            # Fetch data using Selenium
-            html_content = fetch_data(driver, url)
-            
-            if html_content:
-                if st.session_state.debug_mode:
-                    st.text(f"Retrieved {len(html_content)} characters of HTML")
-                
-                df = parse_race_data(html_content)
-                
-                if df is not None:
-                    st.success("Data successfully scraped!")
-                    
-                    # Add export button and data display in columns
-                    col1, col2 = st.columns([1, 3])
-                    
-                    with col1:
-                        # Create CSV export button
-                        csv_data = df.to_csv(index=False).encode('utf-8')
-                        timestamp = time.strftime("%Y%m%d_%H%M%S")
-                        filename = f"race_data_{timestamp}.csv"
-                        
-                        st.download_button(
-                            label="📥 Export to CSV",
-                            data=csv_data,
-                            file_name=filename,
-                            mime="text/csv"
-                        )
-                    
-                    with col2:
-                        # Display data
-                        st.dataframe(df)
-                    
-                    # Basic statistics
-                    st.subheader("Race Statistics")
-                    col1, col2 = st.columns(2)
-                    
-                    with col1:
-                        st.metric("Total Entries", len(df))
-                    
-                    with col2:
-                        time_columns = [col for col in df.columns if 'time' in col.lower()]
-                        if time_columns:
-                            try:
-                                best_time = df[time_columns[0]].min()
-                                st.metric("Best Time", best_time)
-                            except:
-                                pass
-                
-                else:
-                    st.error("Failed to parse data from the page")
-                    if st.session_state.debug_mode:
-                        st.text("HTML Preview (first 1000 characters):")
-                        st.code(html_content[:1000], language='html')
-        
-        finally:
-            # Clean up
-            driver.quit()
+    # Most result pages are static, only render them in Chrome when needed
+    use_browser = st.checkbox("Always use headless browser", value=False)
+    
+    # Only the scraping section reruns for its own widgets and each poll,
+    # the page header and sidebar are left alone
+    run_every = update_frequency if st.session_state.scraping else None
+    st.fragment(scrape_section, run_every=run_every)(use_browser, update_frequency)
 
 if __name__ == "__main__":
     main()